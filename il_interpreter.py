@@ -1,227 +1,809 @@
 from abc import ABC, abstractmethod
-import re
+import functools
+import logging
+import operator
+import sys
+
+logger = logging.getLogger(__name__)
+
+# Виды операндов, определяемые один раз при разборе программы
+CONST = 'C'
+REGISTER = 'R'
+# Операнд ACC: во время выполнения аккумулятор хранится в локальной
+# переменной acc, поэтому читается оттуда, а не из списка регистров
+ACCUMULATOR = 'A'
+
+# Коды операций для JIT-компиляции программы (см. ILInterpreter.jit)
+OP_LD = 0
+OP_ST = 1
+OP_AND = 2
+OP_ANDN = 3
+OP_OR = 4
+OP_ORN = 5
+OP_XOR = 6
+OP_XORN = 7
+OP_ADD = 8
+OP_SUB = 9
+OP_MUL = 10
+OP_DIV = 11
+OP_MOD = 12
+OP_NOT = 13
+OP_S = 14
+OP_R = 15
+OP_JMP = 16
+OP_JMPC = 17
+OP_JMPNC = 18
+
+# Кодирование операндов и регистров в массивах int64 для JIT:
+# операнд-регистр помечается битом REG_FLAG, операнд ACC - битом ACC_FLAG,
+# значения вне 32 бит обозначают незаписанную переменную и результаты S/R
+REG_FLAG = 1 << 32
+ACC_FLAG = 1 << 33
+UNSET_SLOT = -1
+FALSE_SLOT = -2
+TRUE_SLOT = -3
+
+# Ожидаемая работа программы оценивается во время выполнения как длина
+# программы, умноженная на число выполненных обратных переходов (итераций
+# циклов); JIT-компиляция окупается, когда эта оценка превышает порог
+JIT_THRESHOLD = 10_000
+# compile()/exec небольшой программы стоит примерно как 10 000 команд цикла
+# по командам, поэтому генерация кода использует тот же способ оценки
+CODEGEN_THRESHOLD = 10_000
+
+# Операции с инверсией второго операнда, которых нет в модуле operator
+def and_not(a: int, b: int) -> int:
+    return a & ~b
+
+def or_not(a: int, b: int) -> int:
+    return a | ~b
+
+def xor_not(a: int, b: int) -> int:
+    return a ^ ~b
+
+def operand_source(kind: str, value: int) -> str:
+    if kind is CONST:
+        return str(value)
+    elif kind is REGISTER:
+        return f'((regs[{value}] or 0) & 0xFFFFFFFF)'
+    return 'acc'
 
 class Command(ABC):
+    __slots__ = ()
+    opcode = None
+
     @abstractmethod
-    def execute(self, interpreter: 'ILInterpreter') -> None:
+    def execute(self, acc: int, pc: int, regs: list) -> tuple:
         pass
 
-def debug_decorator(func):
-    def wrapper(self, interpreter):
-        result = func(self, interpreter)
-        interpreter.debug_registers()
-        return result
-    return wrapper
+    # Строки Python-кода для ILInterpreter.compile_program, работающие
+    # с локальными acc и regs; None - команда не поддерживает генерацию кода
+    def source(self) -> list:
+        return None
 
 class LoadCommand(Command):
-    def __init__(self, expression: str) -> None:
-        self.expression = expression
+    __slots__ = ('kind', 'value')
+    opcode = OP_LD
+
+    def __init__(self, operand: tuple) -> None:
+        self.kind, self.value = operand
     
-    @debug_decorator
-    def execute(self, interpreter: 'ILInterpreter') -> None:
-        interpreter.registers['ACC'] = interpreter.evaluate_expression(self.expression) & 0xFFFFFFFF
+    def execute(self, acc: int, pc: int, regs: list) -> tuple:
+        if self.kind is CONST:
+            return self.value, pc + 1
+        elif self.kind is REGISTER:
+            return (regs[self.value] or 0) & 0xFFFFFFFF, pc + 1
+        return acc, pc + 1
+
+    def source(self) -> list:
+        return [f'acc = {operand_source(self.kind, self.value)}']
 
 class StoreCommand(Command):
-    def __init__(self, variable: str) -> None:
+    __slots__ = ('variable',)
+    opcode = OP_ST
+
+    def __init__(self, variable: int) -> None:
         self.variable = variable
     
-    @debug_decorator
-    def execute(self, interpreter: 'ILInterpreter') -> None:
-        interpreter.registers[self.variable] = interpreter.registers['ACC']
+    def execute(self, acc: int, pc: int, regs: list) -> tuple:
+        regs[self.variable] = acc
+        return acc, pc + 1
+
+    def source(self) -> list:
+        return [f'regs[{self.variable}] = acc']
 
 class BinaryCommand(Command):
-    def __init__(self, expression: str) -> None:
-        self.expression = expression
-    
-    @debug_decorator
-    def execute(self, interpreter: 'ILInterpreter') -> None:
-        value = interpreter.evaluate_expression(self.expression) & 0xFFFFFFFF
-        self.apply_operation(interpreter, value)
-        interpreter.registers['ACC'] &= 0xFFFFFFFF
-    
-    @abstractmethod
-    def apply_operation(self, interpreter: 'ILInterpreter', value: int) -> None:
-        pass
+    __slots__ = ('kind', 'value')
+    # Выражение операции для генерации кода, {} - второй операнд
+    template = None
+
+    def __init__(self, operand: tuple) -> None:
+        self.kind, self.value = operand
+
+    # Каждая операция задаётся функцией op (для выполнения команды и свёртки
+    # констант) и шаблоном template (для генерации кода)
+    def execute(self, acc: int, pc: int, regs: list) -> tuple:
+        if self.kind is CONST:
+            value = self.value
+        elif self.kind is REGISTER:
+            value = (regs[self.value] or 0) & 0xFFFFFFFF
+        else:
+            value = acc
+        return self.op(acc, value) & 0xFFFFFFFF, pc + 1
+
+    def source(self) -> list:
+        value = operand_source(self.kind, self.value)
+        return [f'acc = ({self.template.format(value)}) & 0xFFFFFFFF']
 
 class AndCommand(BinaryCommand):
-    def apply_operation(self, interpreter: 'ILInterpreter', value: int) -> None:
-        result = interpreter.registers['ACC'] & value
-        interpreter.registers['ACC'] = result & 0xFFFFFFFF
+    __slots__ = ()
+    opcode = OP_AND
+    op = operator.and_
+    template = 'acc & {}'
 
 class OrCommand(BinaryCommand):
-    def apply_operation(self, interpreter: 'ILInterpreter', value: int) -> None:
-        result = interpreter.registers['ACC'] | value
-        interpreter.registers['ACC'] = result & 0xFFFFFFFF
+    __slots__ = ()
+    opcode = OP_OR
+    op = operator.or_
+    template = 'acc | {}'
 
 class AddCommand(BinaryCommand):
-    def apply_operation(self, interpreter: 'ILInterpreter', value: int) -> None:
-        result = interpreter.registers['ACC'] + value
-        interpreter.registers['ACC'] = result & 0xFFFFFFFF
+    __slots__ = ()
+    opcode = OP_ADD
+    op = operator.add
+    template = 'acc + {}'
 
 class SubCommand(BinaryCommand):
-    def apply_operation(self, interpreter: 'ILInterpreter', value: int) -> None:
-        result = interpreter.registers['ACC'] - value
-        interpreter.registers['ACC'] = result & 0xFFFFFFFF
+    __slots__ = ()
+    opcode = OP_SUB
+    op = operator.sub
+    template = 'acc - {}'
 
 class NotCommand(Command):
-    @debug_decorator
-    def execute(self, interpreter: 'ILInterpreter') -> None:
-        result = ~interpreter.registers['ACC']
-        interpreter.registers['ACC'] = result & 0xFFFFFFFF
+    __slots__ = ()
+    opcode = OP_NOT
+
+    def execute(self, acc: int, pc: int, regs: list) -> tuple:
+        return ~acc & 0xFFFFFFFF, pc + 1
+
+    def source(self) -> list:
+        return ['acc = ~acc & 0xFFFFFFFF']
 
 class ConditionalCommand(Command):
-    def __init__(self, variable: str) -> None:
+    __slots__ = ('variable',)
+
+    def __init__(self, variable: int) -> None:
         self.variable = variable
 
-    @debug_decorator
-    def execute(self, interpreter: 'ILInterpreter') -> None:
-        if interpreter.registers['ACC']:
-            self.apply_operation(interpreter)
+    def execute(self, acc: int, pc: int, regs: list) -> tuple:
+        if acc:
+            acc = self.apply_operation(acc, regs)
+        return acc, pc + 1
 
     @abstractmethod
-    def apply_operation(self, interpreter: 'ILInterpreter') -> None:
+    def apply_operation(self, acc: int, regs: list) -> int:
         pass
 
+    def target_source(self) -> str:
+        # S ACC / R ACC изменяют сам аккумулятор, а не regs[0]
+        return 'acc' if self.variable == 0 else f'regs[{self.variable}]'
+
 class SCommand(ConditionalCommand):
-    def apply_operation(self, interpreter: 'ILInterpreter') -> None:
-        interpreter.registers[self.variable] = True
+    __slots__ = ()
+    opcode = OP_S
+
+    def apply_operation(self, acc: int, regs: list) -> int:
+        if self.variable == 0:
+            return True
+        regs[self.variable] = True
+        return acc
+
+    def source(self) -> list:
+        return ['if acc:', f'    {self.target_source()} = True']
 
 class RCommand(ConditionalCommand):
-    def apply_operation(self, interpreter: 'ILInterpreter') -> None:
-        interpreter.registers[self.variable] = False
+    __slots__ = ()
+    opcode = OP_R
+
+    def apply_operation(self, acc: int, regs: list) -> int:
+        if self.variable == 0:
+            return False
+        regs[self.variable] = False
+        return acc
+
+    def source(self) -> list:
+        return ['if acc:', f'    {self.target_source()} = False']
 
 class JmpCommand(Command):
+    __slots__ = ('label', 'target')
+    opcode = OP_JMP
+
     def __init__(self, label: str) -> None:
         self.label = label
+        # Индекс команды, на которую указывает метка; заполняется в prepare()
+        self.target = None
     
-    @debug_decorator
-    def execute(self, interpreter: 'ILInterpreter') -> None:
-        interpreter.program_counter = interpreter.labels[self.label] - 1
+    def execute(self, acc: int, pc: int, regs: list) -> tuple:
+        return acc, self.target
 
 class JmpcCommand(JmpCommand):
-    @debug_decorator
-    def execute(self, interpreter: 'ILInterpreter') -> None:
-        if interpreter.registers['ACC']:
-            interpreter.program_counter = interpreter.labels[self.label] - 1
+    __slots__ = ()
+    opcode = OP_JMPC
+
+    def execute(self, acc: int, pc: int, regs: list) -> tuple:
+        if acc:
+            return acc, self.target
+        return acc, pc + 1
 
 class JmpncCommand(JmpCommand):
-    @debug_decorator
-    def execute(self, interpreter: 'ILInterpreter') -> None:
-        if not interpreter.registers['ACC']:
-            interpreter.program_counter = interpreter.labels[self.label] - 1
-
-class NotBinaryCommand(BinaryCommand):
-    @debug_decorator
-    def execute(self, interpreter: 'ILInterpreter') -> None:
-        value = interpreter.evaluate_expression(self.expression) & 0xFFFFFFFF
-        print(f"Evaluating expression: {self.expression}, value: {value}")
-        self.apply_operation(interpreter, value)
-
-class AndnCommand(NotBinaryCommand):
-    def apply_operation(self, interpreter: 'ILInterpreter', value: int) -> None:
-        inverted_value = ~value & 0xFFFFFFFF
-        result = (interpreter.registers['ACC'] & inverted_value) & 0xFFFFFFFF
-        interpreter.registers['ACC'] = result
+    __slots__ = ()
+    opcode = OP_JMPNC
+
+    def execute(self, acc: int, pc: int, regs: list) -> tuple:
+        if not acc:
+            return acc, self.target
+        return acc, pc + 1
+
+class AndnCommand(BinaryCommand):
+    __slots__ = ()
+    opcode = OP_ANDN
+    op = staticmethod(and_not)
+    template = 'acc & ~{}'
 
 class OrnCommand(BinaryCommand):
-    def apply_operation(self, interpreter: 'ILInterpreter', value: int) -> None:
-        inverted_value = ~value & 0xFFFFFFFF  # Инвертируем второй операнд
-        result = interpreter.registers['ACC'] | inverted_value  # Применяем OR
-        interpreter.registers['ACC'] = result & 0xFFFFFFFF  # Применяем маску
+    __slots__ = ()
+    opcode = OP_ORN
+    op = staticmethod(or_not)
+    template = 'acc | ~{}'
 
 class XorCommand(BinaryCommand):
-    def apply_operation(self, interpreter: 'ILInterpreter', value: int) -> None:
-        interpreter.registers['ACC'] ^= value
+    __slots__ = ()
+    opcode = OP_XOR
+    op = operator.xor
+    template = 'acc ^ {}'
 
 class XornCommand(BinaryCommand):
-    def apply_operation(self, interpreter: 'ILInterpreter', value: int) -> None:
-        inverted_value = ~value & 0xFFFFFFFF  # Инвертируем второй операнд
-        result = interpreter.registers['ACC'] ^ inverted_value  # Применяем XOR
-        interpreter.registers['ACC'] = result & 0xFFFFFFFF  # Применяем маску
+    __slots__ = ()
+    opcode = OP_XORN
+    op = staticmethod(xor_not)
+    template = 'acc ^ ~{}'
 
 class MulCommand(BinaryCommand):
-    def apply_operation(self, interpreter: 'ILInterpreter', value: int) -> None:
-        interpreter.registers['ACC'] *= value
+    __slots__ = ()
+    opcode = OP_MUL
+    op = operator.mul
+    template = 'acc * {}'
 
 class DivCommand(BinaryCommand):
-    def apply_operation(self, interpreter: 'ILInterpreter', value: int) -> None:
-        interpreter.registers['ACC'] //= value
+    __slots__ = ()
+    opcode = OP_DIV
+    op = operator.floordiv
+    template = 'acc // {}'
 
 class ModCommand(BinaryCommand):
-    def apply_operation(self, interpreter: 'ILInterpreter', value: int) -> None:
-        interpreter.registers['ACC'] %= value
+    __slots__ = ()
+    opcode = OP_MOD
+    op = operator.mod
+    template = 'acc % {}'
+
+# Суперинструкции: частые последовательности команд, объединённые
+# оптимизатором ILInterpreter.optimize_program в одну команду.
+# parts хранит исходные команды для JIT-кодирования
+
+class LoadStoreCommand(Command):
+    __slots__ = ('parts', 'kind', 'value', 'variable')
+
+    def __init__(self, load: LoadCommand, store: StoreCommand) -> None:
+        self.parts = (load, store)
+        self.kind, self.value = load.kind, load.value
+        self.variable = store.variable
+
+    def execute(self, acc: int, pc: int, regs: list) -> tuple:
+        if self.kind is CONST:
+            acc = self.value
+        elif self.kind is REGISTER:
+            acc = (regs[self.value] or 0) & 0xFFFFFFFF
+        regs[self.variable] = acc
+        return acc, pc + 1
+
+    def source(self) -> list:
+        return [line for part in self.parts for line in part.source()]
+
+class LoadBinaryStoreCommand(Command):
+    __slots__ = ('parts', 'kind', 'value', 'op', 'op_kind', 'op_value', 'variable')
+
+    def __init__(self, load: LoadCommand, binary: BinaryCommand, store: StoreCommand) -> None:
+        self.parts = (load, binary, store)
+        self.kind, self.value = load.kind, load.value
+        self.op, self.op_kind, self.op_value = binary.op, binary.kind, binary.value
+        self.variable = store.variable
+
+    def execute(self, acc: int, pc: int, regs: list) -> tuple:
+        if self.kind is CONST:
+            acc = self.value
+        elif self.kind is REGISTER:
+            acc = (regs[self.value] or 0) & 0xFFFFFFFF
+        if self.op_kind is CONST:
+            value = self.op_value
+        elif self.op_kind is REGISTER:
+            value = (regs[self.op_value] or 0) & 0xFFFFFFFF
+        else:
+            value = acc
+        acc = regs[self.variable] = self.op(acc, value) & 0xFFFFFFFF
+        return acc, pc + 1
+
+    def source(self) -> list:
+        return [line for part in self.parts for line in part.source()]
+
+def execute_encoded(opcodes, operands, regs, pc: int) -> int:
+    n = len(opcodes)
+    acc = regs[0]
+    while pc < n:
+        op = opcodes[pc]
+        arg = operands[pc]
+        pc += 1
+        if op == OP_ST:
+            regs[arg] = acc
+        elif op == OP_S:
+            if acc != 0:
+                if arg == 0:
+                    acc = 1
+                else:
+                    regs[arg] = TRUE_SLOT
+        elif op == OP_R:
+            if acc != 0:
+                if arg == 0:
+                    acc = 0
+                else:
+                    regs[arg] = FALSE_SLOT
+        elif op == OP_JMP:
+            pc = arg
+        elif op == OP_JMPC:
+            if acc != 0:
+                pc = arg
+        elif op == OP_JMPNC:
+            if acc == 0:
+                pc = arg
+        elif op == OP_NOT:
+            acc = ~acc & 0xFFFFFFFF
+        else:
+            if arg & ACC_FLAG:
+                value = acc
+            elif arg & REG_FLAG:
+                value = regs[arg ^ REG_FLAG]
+                if value < 0:
+                    value = 1 if value == TRUE_SLOT else 0
+            else:
+                value = arg
+            if op == OP_LD:
+                acc = value
+            elif op == OP_AND:
+                acc = acc & value
+            elif op == OP_ANDN:
+                acc = acc & (~value & 0xFFFFFFFF)
+            elif op == OP_OR:
+                acc = acc | value
+            elif op == OP_ORN:
+                acc = acc | (~value & 0xFFFFFFFF)
+            elif op == OP_XOR:
+                acc = acc ^ value
+            elif op == OP_XORN:
+                acc = acc ^ (~value & 0xFFFFFFFF)
+            elif op == OP_ADD:
+                acc = (acc + value) & 0xFFFFFFFF
+            elif op == OP_SUB:
+                acc = (acc - value) & 0xFFFFFFFF
+            elif op == OP_MUL:
+                # В int64 произведение может переполниться, но младшие 32 бита верны
+                acc = (acc * value) & 0xFFFFFFFF
+            elif op == OP_DIV:
+                acc = acc // value
+            elif op == OP_MOD:
+                acc = acc % value
+    regs[0] = acc
+    return pc
+
+# numba импортируется, а ядро компилируется (или загружается из кэша на
+# диске) только при первом создании ILInterpreter(jit=True); без numba - None
+@functools.lru_cache(maxsize=None)
+def load_jit_kernel():
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    return njit(cache=True)(execute_encoded)
+
+def encode_slot(value) -> int:
+    if value is None:
+        return UNSET_SLOT
+    elif value is True:
+        return TRUE_SLOT
+    elif value is False:
+        return FALSE_SLOT
+    return value
+
+def decode_slot(value: int):
+    if value == UNSET_SLOT:
+        return None
+    elif value == TRUE_SLOT:
+        return True
+    elif value == FALSE_SLOT:
+        return False
+    return value
+
+COMMAND_MAP = {
+    'LD': LoadCommand,
+    'ST': StoreCommand,
+    'AND': AndCommand,
+    'ANDN': AndnCommand,
+    'OR': OrCommand,
+    'ORN': OrnCommand,
+    'XOR': XorCommand,
+    'XORN': XornCommand,
+    'ADD': AddCommand,
+    'SUB': SubCommand,
+    'MUL': MulCommand,
+    'DIV': DivCommand,
+    'MOD': ModCommand,
+    'NOT': NotCommand,
+    'S': SCommand,
+    'R': RCommand,
+    'JMP': JmpCommand,
+    'JMPC': JmpcCommand,
+    'JMPNC': JmpncCommand
+}
 
 class ILParser:
+    def __init__(self, var_index: dict = None) -> None:
+        # Имя переменной -> индекс в списке регистров интерпретатора
+        self.var_index = var_index if var_index is not None else {'ACC': 0}
+        # Повторяющиеся операнды (например, 16#F0 в цикле) разбираются один раз
+        self.operand_cache = {}
+
     def parse(self, line: str) -> Command:
         parts = line.split()
         command = parts[0]
         args = parts[1:]
         
-        command_map = {
-            'LD': LoadCommand,
-            'ST': StoreCommand,
-            'AND': AndCommand,
-            'ANDN': AndnCommand,
-            'OR': OrCommand,
-            'ORN': OrnCommand,
-            'XOR': XorCommand,
-            'XORN': XornCommand,
-            'ADD': AddCommand,
-            'SUB': SubCommand,
-            'MUL': MulCommand,
-            'DIV': DivCommand,
-            'MOD': ModCommand,
-            'NOT': NotCommand,
-            'S': SCommand,
-            'R': RCommand,
-            'JMP': JmpCommand,
-            'JMPC': JmpcCommand,
-            'JMPNC': JmpncCommand
-        }
-
-        if command in command_map:
-            return command_map[command](*args)
+        command_class = COMMAND_MAP.get(command)
+        if command_class is not None:
+            if issubclass(command_class, (LoadCommand, BinaryCommand)):
+                args = [self.parse_operand(arg) for arg in args]
+            elif issubclass(command_class, (StoreCommand, ConditionalCommand)):
+                args = [self.register_index(arg) for arg in args]
+            elif issubclass(command_class, JmpCommand):
+                args = [sys.intern(arg) for arg in args]
+            return command_class(*args)
         else:
             raise ValueError(f"Unknown instruction {command}")
 
+    def parse_operand(self, expression: str) -> tuple:
+        if expression in self.operand_cache:
+            return self.operand_cache[expression]
+        if expression == 'ACC':
+            operand = ACCUMULATOR, 0
+        elif expression.isdigit():
+            operand = CONST, int(expression) & 0xFFFFFFFF
+        elif expression.startswith('16#'):
+            operand = CONST, int(expression[3:], 16) & 0xFFFFFFFF
+        else:
+            operand = REGISTER, self.register_index(expression)
+        self.operand_cache[expression] = operand
+        return operand
+
+    def register_index(self, name: str) -> int:
+        if not name.isidentifier():
+            raise ValueError(f"Invalid variable name: {name}")
+        return self.var_index.setdefault(sys.intern(name), len(self.var_index))
+
 class ILInterpreter:
-    def __init__(self) -> None:
-        self.registers = {'ACC': 0}
+    def __init__(self, debug: bool = False, jit: bool = False, codegen: bool = True) -> None:
+        self.debug = debug
+        self.jit = jit
+        self.codegen = codegen
+        self._kernel = load_jit_kernel() if jit else None
+        if jit and self._kernel is None:
+            logger.warning("numba is not available, JIT compilation is disabled")
+        # ACC всегда имеет индекс 0; None означает, что переменная ещё не записана
+        self.var_index = {'ACC': 0}
+        self.regs = [0]
         self.program = []
+        self._handlers = []
+        self._profiled = []
+        self._budget = 0
+        self._resume = 0
+        self._encoded = None
+        self._compiled = None
+        self._block_starts = set()
         self.program_counter = 0
         self.labels = {}
-        self.parser = ILParser()
+        # Метки, на которые ссылаются переходы; могут быть определены
+        # следующим вызовом load_program, поэтому проверяются в run()
+        self.jump_labels = set()
+        self._prepared = False
+        self.parser = ILParser(self.var_index)
+
+    @property
+    def registers(self) -> dict:
+        regs = self.regs
+        return {name: regs[idx] for name, idx in self.var_index.items() if regs[idx] is not None}
     
     def load_program(self, program: str) -> None:
-        lines = [line.strip() for line in program.split('\n') if line.strip()]
-        for idx, line in enumerate(lines):
+        start = len(self.program)
+        for line in program.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
             if ':' in line:
-                label, line = line.split(':', 1)
-                self.labels[label.strip()] = len(self.program)
+                label, _, line = line.partition(':')
+                self.labels[sys.intern(label.strip())] = len(self.program)
                 line = line.strip()
             if line:
-                self.program.append(self.parser.parse(line))
-    
+                command = self.parser.parse(line)
+                if isinstance(command, JmpCommand):
+                    self.jump_labels.add(command.label)
+                self.program.append(command)
+        self.regs.extend([None] * (len(self.var_index) - len(self.regs)))
+        self.optimize_program(start)
+        self._prepared = False
+
+    def prepare(self) -> None:
+        self.resolve_labels()
+        # Связанные методы execute разрешаются один раз перед выполнением,
+        # а не на каждой итерации цикла
+        self._handlers = [command.execute for command in self.program]
+        self._profiled = self._handlers
+        self._encoded = None
+        self._compiled = None
+        if self._kernel is not None:
+            self._profiled = self.profile_backward_jumps(JIT_THRESHOLD)
+        elif self.codegen:
+            self._profiled = self.profile_backward_jumps(CODEGEN_THRESHOLD)
+        self._prepared = True
+
+    def profile_backward_jumps(self, threshold: int) -> list:
+        # Обратные переходы считают итерации циклов; когда работа программы
+        # превысит threshold, выполнение переходит в скомпилированный код
+        self._budget = max(1, threshold // max(1, len(self.program)))
+        handlers = list(self._handlers)
+        for pc, command in enumerate(self.program):
+            if isinstance(command, JmpCommand) and command.target <= pc:
+                handlers[pc] = self.count_iterations(command.execute)
+        return handlers
+
+    def count_iterations(self, handler):
+        # Счётчик команд за концом программы останавливает цикл по командам
+        hot = len(self.program) + 1
+
+        def counted(acc: int, pc: int, regs: list) -> tuple:
+            acc, next_pc = handler(acc, pc, regs)
+            if next_pc <= pc:
+                self._budget -= 1
+                if self._budget <= 0:
+                    self._resume = next_pc
+                    return acc, hot
+            return acc, next_pc
+        return counted
+
+    def tier_up(self) -> None:
+        if self._kernel is not None:
+            self._encoded = self.encode_program()
+        if self._encoded is None and self.codegen:
+            self._compiled = self.compile_program()
+        if self._encoded is None and self._compiled is None:
+            # Программу нельзя скомпилировать: счётчики итераций больше не нужны
+            self._profiled = self._handlers
+
+    def optimize_program(self, start: int = 0) -> None:
+        # Оптимизируются только команды, добавленные начиная со start;
+        # ни метка, ни точка продолжения выполнения не должны оказаться
+        # внутри суперинструкции
+        program = self.program
+        n = len(program)
+        targets = set(self.labels.values())
+        targets.add(self.program_counter)
+        optimized = program[:start]
+        # Старый индекс команды -> новый, для меток и счётчика команд
+        new_index = {}
+        pc = start
+        while pc < n:
+            new_index[pc] = len(optimized)
+            command = program[pc]
+            following = []
+            for next_pc in range(pc + 1, min(pc + 3, n)):
+                if next_pc in targets:
+                    break
+                following.append(program[next_pc])
+            if type(command) is LoadCommand and following:
+                second = following[0]
+                third = following[1] if len(following) > 1 else None
+                folded = self.fold_constants(command, second)
+                if folded is not None:
+                    command = folded
+                    if type(third) is StoreCommand:
+                        optimized.append(LoadStoreCommand(command, third))
+                        pc += 3
+                    else:
+                        optimized.append(command)
+                        pc += 2
+                    continue
+                if isinstance(second, BinaryCommand) and type(third) is StoreCommand:
+                    optimized.append(LoadBinaryStoreCommand(command, second, third))
+                    pc += 3
+                    continue
+                if type(second) is StoreCommand:
+                    optimized.append(LoadStoreCommand(command, second))
+                    pc += 2
+                    continue
+                if command.kind is CONST and type(second) in (JmpcCommand, JmpncCommand):
+                    # Направление перехода известно при загрузке
+                    optimized.append(command)
+                    if bool(command.value) == (type(second) is JmpcCommand):
+                        optimized.append(JmpCommand(second.label))
+                    pc += 2
+                    continue
+            optimized.append(command)
+            pc += 1
+        new_index[n] = len(optimized)
+        self.program = optimized
+        self.labels = {label: new_index.get(target, target) for label, target in self.labels.items()}
+        if self.program_counter >= start:
+            self.program_counter = new_index.get(self.program_counter, len(optimized))
+
+    def fold_constants(self, load: Command, binary: Command):
+        # LD <const> / <op> <const>: результат известен при загрузке.
+        # Деление на нулевую константу остаётся до выполнения
+        if not (isinstance(binary, BinaryCommand) and load.kind is CONST and binary.kind is CONST):
+            return None
+        if type(binary) in (DivCommand, ModCommand) and binary.value == 0:
+            return None
+        return LoadCommand((CONST, binary.op(load.value, binary.value) & 0xFFFFFFFF))
+
+    def resolve_labels(self) -> None:
+        # Проверяются все переходы исходной программы, в том числе удалённые оптимизатором
+        unknown = self.jump_labels - self.labels.keys()
+        if unknown:
+            raise ValueError(f"Unknown label {', '.join(sorted(unknown))}")
+        for command in self.program:
+            if isinstance(command, JmpCommand):
+                command.target = self.labels[command.label]
+
+    def compile_program(self):
+        program = self.program
+        n = len(program)
+        # Базовые блоки начинаются с цели перехода или команды после перехода
+        starts = {0, self.program_counter}
+        for pc, command in enumerate(program):
+            if isinstance(command, JmpCommand):
+                starts.add(command.target)
+                starts.add(pc + 1)
+        starts = sorted(start for start in starts if start < n)
+        lines = []
+        for i, start in enumerate(starts):
+            end = starts[i + 1] if i + 1 < len(starts) else n
+            lines.append(f'def block_{start}(acc, regs):')
+            for command in program[start:end]:
+                if isinstance(command, JmpCommand):
+                    break
+                statements = command.source()
+                if statements is None:
+                    return None
+                lines.extend('    ' + statement for statement in statements)
+            last = program[end - 1]
+            if type(last) is JmpCommand:
+                lines.append(f'    return acc, {last.target}')
+            elif type(last) is JmpcCommand:
+                lines.extend(['    if acc:', f'        return acc, {last.target}'])
+            elif type(last) is JmpncCommand:
+                lines.extend(['    if not acc:', f'        return acc, {last.target}'])
+            if type(last) is not JmpCommand:
+                lines.append(f'    return acc, {end}')
+        block_list = ', '.join(f'block_{start}' if start in starts else 'None' for start in range(n))
+        lines.append(f'blocks = [{block_list}]')
+        namespace = {}
+        exec(compile('\n'.join(lines), '<il>', 'exec'), namespace)
+        self._block_starts = set(starts)
+        return namespace['blocks']
+
+    def encode_program(self):
+        # Суперинструкции разворачиваются обратно в исходные команды
+        starts = []
+        commands = []
+        for command in self.program:
+            starts.append(len(commands))
+            commands.extend(getattr(command, 'parts', (command,)))
+        starts.append(len(commands))
+        if any(command.opcode is None for command in commands):
+            return None
+        import numpy as np
+        n = len(commands)
+        opcodes = np.empty(n, dtype=np.int64)
+        operands = np.zeros(n, dtype=np.int64)
+        for pc, command in enumerate(commands):
+            opcodes[pc] = command.opcode
+            if isinstance(command, (LoadCommand, BinaryCommand)):
+                if command.kind is CONST:
+                    operands[pc] = command.value
+                elif command.kind is REGISTER:
+                    operands[pc] = command.value | REG_FLAG
+                else:
+                    operands[pc] = ACC_FLAG
+            elif isinstance(command, (StoreCommand, ConditionalCommand)):
+                operands[pc] = command.variable
+            elif isinstance(command, JmpCommand):
+                operands[pc] = starts[command.target]
+        # starts переводит индекс команды программы в индекс развёрнутой команды
+        return opcodes, operands, starts
+
     def run(self) -> None:
-        while self.program_counter < len(self.program):
-            command = self.program[self.program_counter]
-            command.execute(self)
-            self.program_counter += 1
-    
-    def evaluate_expression(self, expression: str) -> int:
+        if not self._prepared:
+            self.prepare()
+        # Регистры выводятся после каждой команды, только если отладочный
+        # вывод действительно включён в настройках logging
+        trace = self.debug and logger.isEnabledFor(logging.DEBUG)
+        if self._encoded is not None and not trace:
+            self.run_jit()
+            return
+        if self._compiled is not None and not trace and self.program_counter in self._block_starts:
+            self.run_blocks()
+            return
+        handlers = self._handlers if trace else self._profiled
+        n = len(handlers)
+        pc = self.program_counter
+        regs = self.regs
+        # ACC хранится в локальной переменной и записывается в regs[0] только
+        # по завершении (или перед выводом регистров в режиме отладки)
+        acc = regs[0]
+        # Если команда выбросит исключение, ACC и счётчик команд
+        # указывают на неё, а не на начало выполнения
         try:
-            if expression.isdigit():
-                return int(expression) & 0xFFFFFFFF
-            elif expression.startswith('16#'):
-                return int(expression[3:], 16) & 0xFFFFFFFF
-            elif expression in self.registers:
-                return self.registers[expression] & 0xFFFFFFFF
+            if trace:
+                while pc < n:
+                    acc, pc = handlers[pc](acc, pc, regs)
+                    regs[0] = acc
+                    self.debug_registers()
             else:
-                raise ValueError(f"Unknown expression: {expression}")
-        except ValueError as e:
-            print(f"Error evaluating expression {expression}: {e}")
-            return 0
+                while pc < n:
+                    acc, pc = handlers[pc](acc, pc, regs)
+        finally:
+            regs[0] = acc
+            self.program_counter = pc
+        if pc > n:
+            # Цикл оказался горячим: выполнение продолжается с цели перехода
+            # уже скомпилированной программой
+            self.program_counter = self._resume
+            if self._encoded is None and self._compiled is None:
+                self.tier_up()
+            self.run()
+
+    def run_blocks(self) -> None:
+        blocks = self._compiled
+        n = len(blocks)
+        pc = self.program_counter
+        regs = self.regs
+        acc = regs[0]
+        # ACC блока хранится в его локальной переменной, поэтому при исключении
+        # ACC и счётчик команд указывают на начало блока с ошибочной командой
+        try:
+            while pc < n:
+                acc, pc = blocks[pc](acc, regs)
+        finally:
+            regs[0] = acc
+            self.program_counter = pc
+
+    def run_jit(self) -> None:
+        import numpy as np
+        opcodes, operands, starts = self._encoded
+        regs = np.array([encode_slot(value) for value in self.regs], dtype=np.int64)
+        # При исключении в ядре записанные переменные сохраняются, а ACC
+        # и счётчик команд остаются такими, какими были до запуска
+        try:
+            pc = self._kernel(opcodes, operands, regs, starts[self.program_counter])
+        finally:
+            self.regs[:] = [decode_slot(value) for value in regs.tolist()]
+        # Ядро останавливается только за концом программы или на цели перехода,
+        # а это всегда начало команды программы
+        self.program_counter = starts.index(pc)
     
     def debug_registers(self) -> None:
-        self.registers = {k: v & 0xFFFFFFFF if isinstance(v, int) else v for k, v in self.registers.items()}
-        print(f"Registers: {self.registers}")
+        logger.debug("Registers: %s", self.registers)
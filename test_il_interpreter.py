@@ -1,12 +1,22 @@
-from il_interpreter import ILInterpreter
+import unittest
+from unittest import mock
 
-def run_test(program, expected_registers):
-    interpreter = ILInterpreter()
-    interpreter.load_program(program)
-    interpreter.run()
+from il_interpreter import ILInterpreter, load_jit_kernel
+
+def check_registers(interpreter, expected_registers):
     for register, expected_value in expected_registers.items():
         actual_value = interpreter.registers.get(register)
         assert actual_value == expected_value, f"Register {register}: expected {expected_value}, got {actual_value}"
+
+def run_test(program, expected_registers):
+    # Программа выполняется и сгенерированным кодом (циклы компилируются
+    # на первой же итерации), и только циклом по командам
+    for codegen in (True, False):
+        interpreter = ILInterpreter(codegen=codegen)
+        interpreter.load_program(program)
+        with mock.patch('il_interpreter.CODEGEN_THRESHOLD', 0):
+            interpreter.run()
+        check_registers(interpreter, expected_registers)
     print(f"Test passed for program:\n{program}")
 
 def test_load_store():
@@ -88,6 +98,98 @@ def test_arithmetic_operations():
     }
     run_test(program, expected_registers)
 
+def test_operation_chain():
+    program = """
+    LD 16#F0
+    ST X
+    LD X
+    AND 16#FF
+    OR 16#100
+    ANDN 16#0F
+    ORN 16#FFFFFF00
+    XOR 1
+    XORN 16#FFFFFFFE
+    ADD 2
+    SUB 1
+    MUL 3
+    DIV 2
+    MOD 1000
+    ST R
+    """
+    expected_registers = {'X': 240, 'R': 768}
+    run_test(program, expected_registers)
+
+def test_invalid_names():
+    for program in ("LD A.B", "ST A.B", "S 1X", "ADD 16#XYZ"):
+        interpreter = ILInterpreter()
+        try:
+            interpreter.load_program(program)
+        except ValueError:
+            continue
+        raise AssertionError(f"Program {program!r} was loaded without an error")
+
+def test_acc_operand():
+    program = """
+    LD 3
+    ADD ACC
+    ST A
+    ST ACC
+    LD 2
+    Loop: MUL ACC
+    ST B
+    SUB 256
+    JMPNC Done
+    LD B
+    JMP Loop
+    Done: LD B
+    ST C
+    """
+    expected_registers = {'A': 6, 'B': 256, 'C': 256}
+    run_test(program, expected_registers)
+    # S ACC / R ACC устанавливают и сбрасывают сам аккумулятор
+    program = """
+    LD 5
+    S ACC
+    ST A
+    """
+    expected_registers = {'A': True, 'ACC': True}
+    run_test(program, expected_registers)
+    program = """
+    LD 5
+    R ACC
+    ST A
+    JMPC X
+    LD 9
+    ST B
+    X: LD 1
+    """
+    expected_registers = {'A': False, 'B': 9}
+    run_test(program, expected_registers)
+
+def test_wraparound():
+    program = """
+    LD 16#FFFFFFFF
+    ADD 1
+    ST A
+    LD 0
+    SUB 1
+    ST B
+    LD 16#10000
+    MUL 16#10000
+    ST C
+    LD 16#FFFFFFFF
+    MUL A
+    ADD 16#FFFFFFFF
+    ST D
+    """
+    expected_registers = {
+        'A': 0,
+        'B': 4294967295,
+        'C': 0,
+        'D': 4294967295
+    }
+    run_test(program, expected_registers)
+
 def test_control_flow():
     program = """
     LD 1
@@ -119,10 +221,175 @@ def test_control_flow():
     }
     run_test(program, expected_registers)
 
+def test_loop():
+    program = """
+    LD 0
+    ST I
+    Loop: LD I
+    ADD 1
+    ST I
+    SUB 10
+    JMPNC Done
+    JMP Loop
+    Done: LD I
+    ST R
+    """
+    expected_registers = {'I': 10, 'R': 10}
+    run_test(program, expected_registers)
+
+def test_codegen_only_for_hot_loops():
+    straight = ILInterpreter()
+    straight.load_program("LD 1\nADD 2\nST A")
+    straight.run()
+    assert straight._compiled is None, "Straight-line program should not be compiled"
+    short = ILInterpreter()
+    short.load_program("LD 3\nLoop: SUB 1\nJMPC Loop\nST A")
+    short.run()
+    assert short._compiled is None, "Short loop should not be compiled"
+    check_registers(short, {'A': 0})
+    hot = ILInterpreter()
+    hot.load_program("LD 20000\nLoop: SUB 1\nJMPC Loop\nST A")
+    hot.run()
+    assert hot._compiled is not None, "Hot loop should be compiled"
+    check_registers(hot, {'A': 0})
+
+def test_superinstructions():
+    program = """
+    LD 7
+    ADD 1
+    Store: ST A
+    LD 2
+    ST B
+    LD 0
+    JMPC Store
+    LD 1
+    JMPNC Store
+    LD B
+    MUL 3
+    ST C
+    """
+    interpreter = ILInterpreter()
+    interpreter.load_program(program)
+    # LD 7 / ADD 1 сворачивается в LD 8, LD B / MUL 3 / ST C и LD 2 / ST B
+    # объединяются, переходы с известным направлением удаляются,
+    # а ST A остаётся отдельной командой из-за метки
+    assert len(interpreter.program) == 6, f"Unexpected program length {len(interpreter.program)}"
+    interpreter.run()
+    check_registers(interpreter, {'A': 8, 'B': 2, 'C': 6})
+
+def test_incremental_loading():
+    interpreter = ILInterpreter()
+    interpreter.load_program("LD 1\nADD 2")
+    interpreter.run()
+    # Продолжение выполнения с ST A не должно быть поглощено суперинструкцией
+    interpreter.load_program("ST A\nLD 7\nST B")
+    interpreter.run()
+    check_registers(interpreter, {'ACC': 7, 'A': 3, 'B': 7})
+
+def test_labels():
+    interpreter = ILInterpreter()
+    # Метка может быть определена следующим вызовом load_program
+    interpreter.load_program("LD 1\nST A\nJMP End")
+    interpreter.load_program("LD 2\nST A\nEnd: LD 9\nST B")
+    interpreter.run()
+    check_registers(interpreter, {'A': 1, 'B': 9})
+    # Неизвестная метка обнаруживается при запуске, даже если переход удалён оптимизатором
+    for program in ("JMP Nowhere", "LD 0\nJMPC Nowhere"):
+        interpreter = ILInterpreter()
+        interpreter.load_program(program)
+        try:
+            interpreter.run()
+        except ValueError:
+            continue
+        raise AssertionError(f"Program {program!r} ran with an unknown label")
+
+def test_error_keeps_state():
+    program = """
+    LD 3
+    Loop: SUB 1
+    ST A
+    JMPC Loop
+    LD 5
+    ST C
+    DIV Z
+    ST B
+    """
+    for codegen in (True, False):
+        interpreter = ILInterpreter(codegen=codegen)
+        interpreter.load_program(program)
+        try:
+            with mock.patch('il_interpreter.CODEGEN_THRESHOLD', 0):
+                interpreter.run()
+        except ZeroDivisionError:
+            pass
+        else:
+            raise AssertionError("Division by zero was not reported")
+        check_registers(interpreter, {'A': 0, 'C': 5})
+        # Сгенерированный код сообщает о начале блока (LD 5 / ST C),
+        # цикл по командам - о самой команде DIV Z
+        if codegen:
+            assert interpreter.program_counter == 4, interpreter.program_counter
+            check_registers(interpreter, {'ACC': 0})
+        else:
+            assert interpreter.program_counter == 5, interpreter.program_counter
+            check_registers(interpreter, {'ACC': 5})
+    print(f"Test passed for program:\n{program}")
+
+def test_jit():
+    if load_jit_kernel() is None:
+        raise unittest.SkipTest("numba is not available")
+    program = """
+    LD 1
+    ST P
+    LD 0
+    ST I
+    Loop: LD P
+    MUL 16#10001
+    ST P
+    LD I
+    ADD 1
+    ST I
+    SUB 2000
+    JMPC Loop
+    LD 1
+    S X
+    R Y
+    R ACC
+    ST W
+    LD 5
+    ADD ACC
+    ST Z
+    """
+    expected_registers = {'I': 2000, 'P': pow(0x10001, 2000, 2 ** 32), 'X': True, 'Y': False, 'W': 0, 'Z': 10}
+    interpreter = ILInterpreter(jit=True)
+    interpreter.load_program(program)
+    interpreter.run()
+    # Цикл выполняется достаточно долго, чтобы выполнение перешло в JIT
+    assert interpreter._encoded is not None, "Program was not encoded for the JIT"
+    check_registers(interpreter, expected_registers)
+    # После JIT счётчик команд указывает на конец программы, а не внутрь цикла
+    assert interpreter.program_counter == len(interpreter.program)
+    interpreter.load_program("LD I\nADD 2\nST J")
+    interpreter.run()
+    check_registers(interpreter, {'J': 2002})
+    print(f"Test passed for program:\n{program}")
+
 if __name__ == "__main__":
     test_load_store()
     test_set_reset()
     test_logical_operations()
     test_arithmetic_operations()
+    test_operation_chain()
+    test_invalid_names()
+    test_acc_operand()
+    test_wraparound()
     test_control_flow()
+    test_loop()
+    test_codegen_only_for_hot_loops()
+    test_superinstructions()
+    test_incremental_loading()
+    test_labels()
+    test_error_keeps_state()
+    if load_jit_kernel() is not None:
+        test_jit()
     print("All tests passed")